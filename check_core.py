@@ -0,0 +1,57 @@
+# David Castellanos código
+
+# Comprobación de paridad del núcleo compilado (grammar_core.pyx) con la versión en Python puro.
+# Genera gramáticas aleatorias (con producciones vacías, recursión izquierda y ciclos) y verifica
+# que ambos análisis den exactamente los mismos anulables, FIRST, FOLLOW y PRED.
+# Hay que correrla cada vez que se cambie uno de los dos análisis:
+#   python3 setup.py build_ext --inplace
+#   python3 check_core.py [cantidad_de_gramáticas]
+import random
+import sys
+from typing import Dict, List
+
+import first_follow_pred_full_commented as ffp
+
+# Gramática aleatoria: n_nt no terminales N0..N{n_nt-1} y n_t terminales t0..t{n_t-1}.
+# Cada rhs tiene entre 0 y 4 símbolos; alrededor de la mitad de los símbolos son no terminales.
+def random_grammar(rng: random.Random, n_nt: int, n_t: int) -> Dict[str, List[List[str]]]:
+    nts = [f'N{i}' for i in range(n_nt)]
+    ts = [f't{i}' for i in range(n_t)]
+    return {
+        A: [
+            [rng.choice(nts) if rng.random() < 0.5 else rng.choice(ts) for _ in range(rng.randint(0, 4))]
+            for _ in range(rng.randint(1, 4))
+        ]
+        for A in nts
+    }
+
+if __name__ == '__main__':
+    core = ffp._analyze_core
+    if core is None:
+        sys.exit('El núcleo compilado no está disponible: compilarlo con `python3 setup.py build_ext --inplace`.')
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    rng = random.Random(0)
+    for k in range(count):
+        # Algunas gramáticas con más de 64 símbolos para cubrir filas de varias palabras en el núcleo
+        productions = random_grammar(rng, rng.randint(1, 40), rng.randint(1, 60))
+        compiled = ffp.Grammar(productions, start='N0')
+        ffp._analyze_core = None
+        try:
+            pure = ffp.Grammar(productions, start='N0')
+        finally:
+            ffp._analyze_core = core
+
+        # Se compara también el orden de las claves (list(items)), no solo el contenido
+        c_first, c_follow, c_pred = compiled.sorted_results()
+        p_first, p_follow, p_pred = pure.sorted_results()
+        same = (
+            compiled._nullable == pure._nullable
+            and list(c_first.items()) == list(p_first.items())
+            and list(c_follow.items()) == list(p_follow.items())
+            and list(c_pred.items()) == list(p_pred.items())
+        )
+        if not same:
+            sys.exit(f'Diferencia en la gramática {k}: {productions}')
+
+    print(f'OK: {count} gramáticas, mismos resultados en el núcleo compilado y en Python puro')
@@ -1,205 +1,567 @@
 # David Castellanos código
 
-from typing import Dict, List, Set, Tuple
+from typing import AbstractSet, Collection, DefaultDict, Dict, FrozenSet, List, Mapping, Optional, Sequence, Set, Tuple
+from collections import defaultdict, deque
+from functools import lru_cache
 from pathlib import Path
+from types import MappingProxyType
+
+# Núcleo compilado opcional (grammar_core.pyx, se construye con
+# `python3 setup.py build_ext --inplace`). Si no está disponible, o es de una versión con
+# otra interfaz (un .so compilado antes de cambiar analyze), usamos Python puro.
+_CORE_INTERFACE_VERSION = 2
+try:
+    import grammar_core  # type: ignore[import-not-found]
+except ImportError:
+    _analyze_core = None
+else:
+    if getattr(grammar_core, 'INTERFACE_VERSION', None) == _CORE_INTERFACE_VERSION:
+        _analyze_core = grammar_core.analyze
+    else:
+        _analyze_core = None
 
 # Utilidad: reconocer si un símbolo es un no terminal.
-# Aquí definimos nuestra convención: un no terminal es una cadena formada solo por
+# Dentro de Grammar los no terminales son exactamente las claves de las producciones
+# (Grammar._nonterminals); si se pasa ese conjunto, simplemente se consulta.
+# Sin conjunto se usa nuestra convención: un no terminal es una cadena formada solo por
 # letras y en mayúsculas (por ejemplo, 'S', 'A', 'B').
-def is_nonterminal(sym: str) -> bool:
+def is_nonterminal(sym: str, nonterminals: Optional[AbstractSet[str]] = None) -> bool:
+    if nonterminals is not None:
+        return sym in nonterminals
     # Verificamos que sym sea una cadena y que consista de letras y esté en mayúsculas.
     # Esto separa automáticamente terminales como 'a', 'dos', 'uno' (no serán mayúsculas)
     return isinstance(sym, str) and sym.isalpha() and sym.isupper()
 
+# Utilidad: componentes fuertemente conexas (algoritmo de Tarjan, versión iterativa).
+# nodes es la lista de vértices y edges[v] el conjunto de sucesores de v.
+# Devuelve la lista de componentes en orden topológico inverso (primero los sumideros).
+# Usamos una pila explícita en lugar de recursión para no depender del límite de recursión.
+def _tarjan_scc(nodes: List[int], edges: Dict[int, Set[int]]) -> List[List[int]]:
+    index: Dict[int, int] = {}
+    lowlink: Dict[int, int] = {}
+    on_stack: Set[int] = set()
+    stack: List[int] = []
+    components: List[List[int]] = []
+    counter = 0
+
+    for root in nodes:
+        if root in index:
+            continue
+        # Cada marco de la pila de trabajo es (vértice, iterador sobre sus sucesores)
+        work = [(root, iter(edges.get(root, ())))]
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+
+        while work:
+            v, succs = work[-1]
+            advanced = False
+            for w in succs:
+                if w not in index:
+                    # Primer encuentro con w: lo visitamos antes de seguir con v
+                    index[w] = lowlink[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(edges.get(w, ()))))
+                    advanced = True
+                    break
+                if w in on_stack:
+                    lowlink[v] = min(lowlink[v], index[w])
+            if advanced:
+                continue
+
+            # Terminamos con v: actualizamos a su padre y, si v es raíz, cerramos la componente
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[v])
+            if lowlink[v] == index[v]:
+                component: List[int] = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+
+    return components
+
+# Símbolos especiales: ε (cadena vacía) y $ (fin de entrada).
+_EPS = 'ε'
+_EOF = '$'
+
+# Bits reservados en las máscaras: ε siempre se interna con id 0 y $ con id 1,
+# así que probar ε es un simple `mask & _EPS_BIT`.
+_EPS_BIT = 1 << 0
+_EOF_BIT = 1 << 1
+
+# Forma de Grammar.sorted_results(): (FIRST, FOLLOW, PRED) con cada conjunto como tupla ordenada,
+# en diccionarios de solo lectura.
+_SortedResults = Tuple[Mapping[str, Tuple[str, ...]], Mapping[str, Tuple[str, ...]], Mapping[Tuple[str, int], Tuple[str, ...]]]
+
 # Clase Grammar: encapsula una gramática y ofrece métodos FIRST, FIRST(rhs),
 # FOLLOW_ALL y prediction_sets.
+# Internamente cada símbolo se interna como un entero pequeño y los conjuntos FIRST/FOLLOW
+# se representan como máscaras de bits (un int de Python): la unión es un OR, la pertenencia
+# un AND y la igualdad una comparación de enteros. Solo se convierte a Set[str] en la API pública.
 class Grammar:
     def __init__(self, productions: Dict[str, List[List[str]]], start: str):
         # productions: diccionario donde la clave es un no terminal 'A' y el valor
         # es una lista de rhs; cada rhs es una lista de símbolos (terminales o no terminales).
         # start: símbolo inicial (por ejemplo 'S').
+        # El símbolo inicial tiene que ser un no terminal (una clave de productions); lo
+        # comprobamos aquí para que ambos análisis (Python y núcleo compilado) fallen igual.
+        if start not in productions:
+            raise KeyError(start)
         self.productions = productions
         self.start = start
 
-        # Cachés para memoización (evitan recomputar y evitan bucles infinitos):
-        # _first_cache guarda FIRST(X) para cada no terminal X.
-        # _first_rhs_cache guarda FIRST(alpha) para secuencias alpha (tuplas).
-        # _nullable_cache podría usarse para marcar si una rhs deriva ε (lo inferimos desde FIRST(rhs)).
-        # _follow_cache acumula FOLLOW(X) durante la iteración.
-        self._first_cache: Dict[str, Set[str]] = {}
-        self._first_rhs_cache: Dict[Tuple[str, ...], Set[str]] = {}
-        self._nullable_cache: Dict[Tuple[str, ...], bool] = {}
-        self._follow_cache: Dict[str, Set[str]] = {}
-
-    # FIRST(X)
-    # Calcula FIRST de un no terminal X (con memoización).
-    # La implementación es recursiva porque FIRST(X) puede depender de FIRST de otros no terminales.
-    def first(self, X: str) -> Set[str]:
-        # Si ya lo calculamos, lo devolvemos de inmediato.
-        if X in self._first_cache:
-            return self._first_cache[X]
-
-        # Resultado que construiremos gradualmente.
+        # Tabla de internado: símbolo -> id y id -> símbolo.
+        # ε y $ se internan primero para que tengan bits fijos (_EPS_BIT y _EOF_BIT).
+        self._sym_id: Dict[str, int] = {}
+        self._id_sym: List[str] = []
+        for sym in (_EPS, _EOF):
+            self._intern(sym)
+        for A, rhss in productions.items():
+            self._intern(A)
+            for rhs in rhss:
+                for sym in rhs:
+                    self._intern(sym)
+
+        # Producciones internas: id del no terminal -> lista de rhs como tuplas de ids.
+        # Un 'ε' dentro de una rhs denota la cadena vacía, así que no se guarda (A -> ε queda como A -> ()).
+        self._prods: Dict[int, List[Tuple[int, ...]]] = {
+            self._sym_id[A]: [self._rhs_ids(rhs) for rhs in rhss]
+            for A, rhss in productions.items()
+        }
+        self._start_id = self._sym_id[start]
+
+        # Los no terminales son las claves de las producciones; se fijan una vez aquí para que
+        # clasificar un símbolo en los bucles sea una simple consulta a un frozenset.
+        self._nonterminals: FrozenSet[str] = frozenset(productions)
+        self._nt_ids: FrozenSet[int] = frozenset(self._sym_id[A] for A in self._nonterminals)
+
+        # Disposición de cada rhs para el recorrido de derecha a izquierda de _analyze (FOLLOW
+        # y FIRST(rhs)): solo las posiciones de no terminales, así ese bucle no clasifica ni
+        # salta terminales.
+        # _rhs_layout[A] tiene, por cada rhs de A, un par (head, positions):
+        #   - positions: tupla de pares (B, cut) para cada no terminal B, de derecha a izquierda;
+        #     cut es FIRST de lo que sigue a B cuando no depende de otro no terminal
+        #     ({ε} si B es el último símbolo, {t} si le sigue el terminal t) y 0 si a B le
+        #     sigue otro no terminal (entonces FIRST del resto sale del paso anterior).
+        #   - head: igual que cut pero para la rhs completa ({ε} si es vacía, {t} si empieza
+        #     con el terminal t, 0 si empieza con un no terminal).
+        self._rhs_layout: Dict[int, List[Tuple[int, Tuple[Tuple[int, int], ...]]]] = {}
+        for A_id, rhs_ids in self._prods.items():
+            entries = []
+            for rhs_id in rhs_ids:
+                positions = []
+                # cut = FIRST conocido de lo que hay a la derecha de sym_id (al empezar, el sufijo vacío)
+                cut = _EPS_BIT
+                for sym_id in reversed(rhs_id):
+                    if sym_id in self._nt_ids:
+                        positions.append((sym_id, cut))
+                        cut = 0
+                    else:
+                        cut = 1 << sym_id
+                entries.append((cut, tuple(positions)))
+            self._rhs_layout[A_id] = entries
+
+        # Cachés para memoización:
+        # _first_cache guarda la máscara FIRST(X) para cada no terminal X (por id).
+        # _follow_cache guarda la máscara FOLLOW(X) de cada no terminal X (en el orden de las
+        # producciones). Es un dict normal: se llena una sola vez y leer un id que no es no
+        # terminal tiene que fallar, no agregar una clave fantasma a follow_all().
+        self._first_cache: Dict[int, int] = {}
+        self._follow_cache: Dict[int, int] = {}
+
+        # FIRST(alpha) de secuencias arbitrarias (first_of_rhs, derives_epsilon) se memoriza
+        # con un lru_cache propio de esta instancia: la caché vive y muere con la gramática.
+        # Se indexa por el valor de la tupla; un pool de instancias canónicas para indexar por
+        # id() no ahorraría nada, porque encontrar la instancia ya obliga a hashear la tupla.
+        self._first_mask_of_rhs = lru_cache(maxsize=None)(self._first_mask_of_seq)
+
+        # _pred_cache guarda, por no terminal A, la máscara PRED de cada una de sus rhs (en orden).
+        self._pred_cache: Dict[int, List[int]] = {}
+
+        # _sorted_results guarda lo que devuelve sorted_results() una vez calculado.
+        self._sorted_results: Optional[_SortedResults] = None
+
+        # Todo el análisis (anulables, FIRST, FOLLOW y PRED) se hace aquí una sola vez;
+        # los métodos públicos solo consultan las tablas resultantes.
+        self._nullable: Set[int] = set()
+        self._analyze()
+
+    # Interna un símbolo (si no lo estaba) y devuelve su id.
+    def _intern(self, sym: str) -> int:
+        if sym not in self._sym_id:
+            self._sym_id[sym] = len(self._id_sym)
+            self._id_sym.append(sym)
+        return self._sym_id[sym]
+
+    # Convierte una rhs de la gramática (todos sus símbolos ya internados) en su tupla de ids,
+    # sin los 'ε'.
+    def _rhs_ids(self, rhs: Sequence[str]) -> Tuple[int, ...]:
+        return tuple(self._sym_id[sym] for sym in rhs if sym != _EPS)
+
+    # Convierte una secuencia de consulta en la tupla de ids de su prefijo conocido (sin los 'ε')
+    # y el primer símbolo que la gramática no conoce (None si no hay ninguno).
+    # Las consultas no internan nada: un símbolo desconocido es un terminal, así que lo que
+    # venga después no influye en FIRST de la secuencia y no hace falta darle un id.
+    def _query_ids(self, rhs: Sequence[str]) -> Tuple[Tuple[int, ...], Optional[str]]:
+        ids: List[int] = []
+        for sym in rhs:
+            if sym == _EPS:
+                continue
+            sym_id = self._sym_id.get(sym)
+            if sym_id is None:
+                return tuple(ids), sym
+            ids.append(sym_id)
+        return tuple(ids), None
+
+    # Convierte una máscara de bits de vuelta a un conjunto de símbolos (frontera de la API).
+    # Solo se visitan los bits encendidos (mask & -mask aísla el bit más bajo), en vez de
+    # filtrar con un generador todos los ids de la tabla.
+    def _to_set(self, mask: int) -> Set[str]:
         result: Set[str] = set()
-
-        # Guardamos una referencia temprana en la caché para prevenir recursión infinita
-        # en el caso de gramáticas con recursión izquierda (por ejemplo X -> X a).
-        # Al colocar un set vacío, si durante la recursión volvemos a pedir FIRST(X),
-        # obtendremos ese set temporal y no entraremos en bucle infinito.
-        self._first_cache[X] = result
-
-        # Iteramos sobre todas las producciones X -> alpha
-        for alpha in self.productions.get(X, []):
-            # Calculamos FIRST(alpha) (FIRST de la secuencia derecha)
-            first_alpha = self.first_of_rhs(tuple(alpha))
-            # Añadimos todos los símbolos de FIRST(alpha) excepto ε
-            result.update(x for x in first_alpha if x != 'ε')
-            # Si FIRST(alpha) contiene ε, entonces X puede derivar ε
-            if 'ε' in first_alpha:
-                result.add('ε')
-
-        # Guardamos el resultado final en la caché y lo devolvemos
-        self._first_cache[X] = result
+        while mask:
+            low = mask & -mask
+            result.add(self._id_sym[low.bit_length() - 1])
+            mask ^= low
         return result
 
-    # FIRST de una secuencia
-    # Calcula FIRST(alpha) donde alpha es una tupla de símbolos (terminales/no terminales).
+    # Análisis completo de la gramática, llamado una vez desde el constructor.
+    # Los pasos dependen unos de otros (FIRST necesita saber qué es anulable y los sufijos
+    # necesitan FIRST definitivo), pero cada uno recorre las producciones una sola vez:
+    #   1. no terminales anulables (lista de trabajo, ver _compute_nullable)
+    #   2. FIRST de cada no terminal (lista de trabajo, ver _compute_first)
+    #   3. un único recorrido de derecha a izquierda por cada rhs que obtiene a la vez FIRST
+    #      de todos sus sufijos, FIRST(rhs) y las restricciones de FOLLOW
+    #   4. propagación de FOLLOW (ver _propagate_follow) y conjuntos PRED
+    # Si el núcleo compilado está disponible, hace estos mismos pasos en C++ y aquí solo
+    # copiamos sus resultados en las cachés.
+    def _analyze(self) -> None:
+        if _analyze_core is not None:
+            nullable, first, follow, preds = _analyze_core(
+                len(self._id_sym), self._prods, self._start_id
+            )
+            self._nullable = nullable
+            self._first_cache.update(first)
+            self._follow_cache.update(follow)
+            self._pred_cache.update(preds)
+            return
+
+        self._nullable = self._compute_nullable()
+        self._compute_first()
+
+        # Restricciones de FOLLOW. Por cada producción A -> X1..Xn y cada no terminal Xi:
+        #   - una contribución constante: FIRST(Xi+1..Xn) - {ε} ⊆ FOLLOW(Xi)
+        #   - una arista de inclusión A -> Xi: FOLLOW(A) ⊆ FOLLOW(Xi), cuando el resto deriva ε
+        #     (o Xi es el último símbolo de la producción).
+        # follow_const[B] acumula (como máscara) los terminales que siempre aparecen en FOLLOW(B);
+        # edges[A] contiene los B tales que FOLLOW(A) ⊆ FOLLOW(B).
+        # Con defaultdict no hace falta inicializar una entrada por no terminal de antemano.
+        follow_const: DefaultDict[int, int] = defaultdict(int)
+        edges: DefaultDict[int, Set[int]] = defaultdict(set)
+        # rhs_first[A][i] = FIRST de la i-ésima rhs de A (la usa PRED al final)
+        rhs_first: Dict[int, List[int]] = {nt: [] for nt in self._prods}
+
+        for A, entries in self._rhs_layout.items():
+            for head, positions in entries:
+                # rest = FIRST(rhs[i+1:]) mientras recorremos de derecha a izquierda solo las
+                # posiciones de no terminales (ver _rhs_layout)
+                rest = 0
+                for sym, cut in positions:
+                    # Si a sym le sigue un terminal (o nada), FIRST del resto ya se conoce
+                    if cut:
+                        rest = cut
+
+                    # Añadimos FIRST(rest) sin ε como contribución constante de FOLLOW(sym)
+                    follow_const[sym] |= rest & ~_EPS_BIT
+                    # Si el resto deriva ε (o está vacío), FOLLOW(A) fluye hacia FOLLOW(sym)
+                    if rest & _EPS_BIT:
+                        edges[A].add(sym)
+
+                    # FIRST(sym rest) = FIRST(sym) - {ε}, más FIRST(rest) si sym es anulable
+                    # (en ese caso ε queda solo si ya estaba en FIRST(rest))
+                    if sym in self._nullable:
+                        rest |= self._first_cache[sym] & ~_EPS_BIT
+                    else:
+                        rest = self._first_cache[sym]
+
+                # Al terminar el recorrido, rest es FIRST(rhs) completo (salvo que la rhs
+                # empiece con un terminal o sea vacía: entonces es head)
+                rhs_first[A].append(head or rest)
+
+        self._propagate_follow(follow_const, edges)
+
+        # PRED(A -> alpha) = FIRST(alpha) - {ε} U (si ε ∈ FIRST(alpha) entonces FOLLOW(A))
+        for A, firsts in rhs_first.items():
+            pred_masks: List[int] = []
+            for first_rhs in firsts:
+                pred = first_rhs & ~_EPS_BIT
+                if first_rhs & _EPS_BIT:
+                    pred |= self._follow_cache[A]
+                pred_masks.append(pred)
+            self._pred_cache[A] = pred_masks
+
+    # No terminales anulables (los que derivan ε), algoritmo de Knuth con lista de trabajo.
+    # Un no terminal es anulable si alguna de sus rhs está formada solo por anulables.
+    # Para cada producción llevamos cuántos símbolos suyos aún no se sabe que son anulables
+    # y un índice inverso no terminal -> producciones donde aparece; cuando un no terminal
+    # pasa a ser anulable decrementamos esos contadores. Coste total O(tamaño de la gramática).
+    def _compute_nullable(self) -> Set[int]:
+        nullable: Set[int] = set()
+        # remaining[p] = símbolos de la producción p que todavía no son anulables;
+        # owner[p] = no terminal del lado izquierdo de la producción p.
+        remaining: List[int] = []
+        owner: List[int] = []
+        # users[B] = producciones donde aparece B (una entrada por cada aparición)
+        users: DefaultDict[int, List[int]] = defaultdict(list)
+        work: List[int] = []
+
+        for A, rhss in self._prods.items():
+            for rhs in rhss:
+                # Una rhs con algún terminal nunca es anulable: ni siquiera la registramos
+                if not self._nt_ids.issuperset(rhs):
+                    continue
+                p = len(remaining)
+                remaining.append(len(rhs))
+                owner.append(A)
+                for sym in rhs:
+                    users[sym].append(p)
+                if not rhs and A not in nullable:
+                    nullable.add(A)
+                    work.append(A)
+
+        while work:
+            B = work.pop()
+            for p in users.get(B, ()):
+                remaining[p] -= 1
+                if remaining[p] == 0 and owner[p] not in nullable:
+                    nullable.add(owner[p])
+                    work.append(owner[p])
+
+        return nullable
+
+    # FIRST de todos los no terminales con una lista de trabajo (sin recursión).
+    # Primero "compilamos" la gramática a una representación plana:
+    # FIRST(A) - {ε} es la unión de una parte constante (los terminales con los que empieza
+    # alguna rhs de A tras un prefijo anulable) y de FIRST(B) - {ε} para cada no terminal B
+    # de ese prefijo. Partimos de FIRST(X) = const[X], encolamos todos los no terminales y,
+    # cada vez que FIRST(B) crece, volvemos a encolar solo los A que dependen de B.
+    # Así la recursión izquierda (A -> A tres) no necesita ningún truco en la caché.
+    def _compute_first(self) -> None:
+        # const[A]: máscara de terminales iniciales; deps[A]: no terminales de los que depende A;
+        # dependents[B]: los A cuyo FIRST hay que recalcular cuando FIRST(B) crece
+        const: Dict[int, int] = {nt: 0 for nt in self._nt_ids}
+        deps: Dict[int, List[int]] = {nt: [] for nt in self._nt_ids}
+        dependents: Dict[int, List[int]] = {nt: [] for nt in self._nt_ids}
+        for A, rhss in self._prods.items():
+            seen: Set[int] = set()
+            for rhs in rhss:
+                for sym in rhs:
+                    if sym not in self._nt_ids:
+                        const[A] |= 1 << sym
+                        break
+                    # A -> A ... no aporta nada nuevo a FIRST(A)
+                    if sym != A and sym not in seen:
+                        seen.add(sym)
+                        deps[A].append(sym)
+                        dependents[sym].append(A)
+                    if sym not in self._nullable:
+                        break
+
+        first = self._first_cache
+        first.update(const)
+
+        # queued evita tener el mismo no terminal más de una vez en la cola
+        queue = deque(A for A in deps if deps[A])
+        queued = set(queue)
+        while queue:
+            A = queue.popleft()
+            queued.discard(A)
+            mask = first[A]
+            for B in deps[A]:
+                mask |= first[B]
+            # Las máscaras solo crecen (partimos de first[A] y solo hacemos OR), así que
+            # detectar el cambio es una comparación de enteros: sin copias ni comparar conjuntos.
+            if mask != first[A]:
+                first[A] = mask
+                for D in dependents[A]:
+                    if D not in queued:
+                        queued.add(D)
+                        queue.append(D)
+
+        # ε nunca entra en const, así que no se propaga entre no terminales: la anulabilidad
+        # ya se conoce y el bit de ε se añade al final
+        for nt in self._nullable:
+            first[nt] |= _EPS_BIT
+
+    # FIRST de una secuencia de ids como máscara.
     # Se aplica la regla estándar: iterar de izquierda a derecha, añadir FIRST(si) menos ε,
     # si FIRST(si) contiene ε, continuar; si todos contienen ε, incluir ε.
-    def first_of_rhs(self, rhs: Tuple[str, ...]) -> Set[str]:
-        # Si ya calculamos FIRST(rhs) antes, devolvemos la caché.
-        if rhs in self._first_rhs_cache:
-            return self._first_rhs_cache[rhs]
-
-        result: Set[str] = set()
-
-        # Caso base: rhs vacío => deriva ε
-        if len(rhs) == 0:
-            result.add('ε')
-            self._first_rhs_cache[rhs] = result
-            return result
-
-        # Recorremos los símbolos de left a right
+    # No memoriza por sí misma: se usa a través de self._first_mask_of_rhs (lru_cache).
+    def _first_mask_of_seq(self, rhs: Tuple[int, ...]) -> int:
+        result = 0
         for sym in rhs:
-            # Si sym es terminal (no es un no terminal según nuestra convención),
-            # entonces FIRST(rhs) contiene directamente ese terminal y se detiene.
-            if not is_nonterminal(sym):
-                result.add(sym)
+            # Si sym es terminal, FIRST(rhs) contiene directamente ese terminal y se detiene.
+            if sym not in self._nt_ids:
+                result |= 1 << sym
                 break
 
             # Si sym es no terminal, añadimos FIRST(sym) excepto ε
-            first_sym = self.first(sym)
-            result.update(x for x in first_sym if x != 'ε')
+            result |= self._first_cache[sym] & ~_EPS_BIT
 
-            # Si FIRST(sym) contiene ε, entonces hay que seguir al siguiente símbolo
-            # porque el prefijo actual puede desaparecer. Si no contiene ε, rompemos.
-            if 'ε' in first_sym:
-                # continue -> seguir con el siguiente símbolo
-                continue
-            else:
-                # sym no es nullable, ya sabemos el prefijo, rompemos.
+            # Si sym no es anulable, el prefijo ya está determinado: rompemos.
+            if sym not in self._nullable:
                 break
         else:
-            # Este 'else' del for se ejecuta cuando el bucle no se rompió:
-            # significa que todos los símbolos fueron nullable => ε está en FIRST(rhs)
-            result.add('ε')
+            # Todos los símbolos fueron nullable (o rhs vacío) => ε está en FIRST(rhs)
+            result |= _EPS_BIT
+
+        return result
+
+    # FIRST(X)
+    # Devuelve FIRST de un no terminal X (ya calculado en el constructor).
+    # Para un terminal (cualquier símbolo que no es no terminal) FIRST(X) = {X}: se resuelve
+    # con una consulta al frozenset de no terminales, sin buscar en las cachés.
+    def first(self, X: str) -> Set[str]:
+        if X not in self._nonterminals:
+            return {X}
+        return self._to_set(self._first_cache[self._sym_id[X]])
 
-        # Guardamos en caché y devolvemos
-        self._first_rhs_cache[rhs] = result
+    # FIRST de una secuencia
+    # Calcula FIRST(alpha) donde alpha es una tupla de símbolos (terminales/no terminales).
+    # Si aparece un símbolo desconocido (terminal), FIRST es el del prefijo conocido y, si ese
+    # prefijo deriva ε, el símbolo desconocido en lugar de ε.
+    def first_of_rhs(self, rhs: Tuple[str, ...]) -> Set[str]:
+        ids, unknown = self._query_ids(rhs)
+        mask = self._first_mask_of_rhs(ids)
+        if unknown is None or not mask & _EPS_BIT:
+            return self._to_set(mask)
+        result = self._to_set(mask & ~_EPS_BIT)
+        result.add(unknown)
         return result
 
     # determines if rhs can derive epsilon
+    # (un símbolo desconocido es un terminal, así que nunca deriva ε)
     def derives_epsilon(self, rhs: Tuple[str, ...]) -> bool:
-        return 'ε' in self.first_of_rhs(rhs)
-
-    # FOLLOW: calcula FOLLOW para todos los no terminales usando un algoritmo de punto fijo.
-    # Inicialmente FOLLOW(start) contiene $ y repetimos propagaciones hasta que no cambie.
-    def follow_all(self) -> Dict[str, Set[str]]:
-        # Aseguramos que exista una entrada en el caché para cada no terminal
-        for nt in self.productions.keys():
-            self._follow_cache.setdefault(nt, set())
+        ids, unknown = self._query_ids(rhs)
+        return unknown is None and bool(self._first_mask_of_rhs(ids) & _EPS_BIT)
+
+    # FOLLOW (máscaras): resuelve las restricciones de FOLLOW como un problema de flujo de
+    # datos. En lugar de repetir pasadas hasta un punto fijo, condensamos el grafo de
+    # inclusiones en componentes fuertemente conexas (todos sus miembros comparten el mismo
+    # FOLLOW) y propagamos una única vez en orden topológico.
+    # const y edges son los defaultdict que arma _analyze: un no terminal sin contribuciones o
+    # sin aristas simplemente no tiene entrada.
+    def _propagate_follow(self, const: DefaultDict[int, int], edges: DefaultDict[int, Set[int]]) -> None:
+        # Partimos de las contribuciones constantes de cada no terminal, en el orden de las
+        # producciones: así follow_all() y sorted_results() devuelven las claves en ese orden
+        # (el mismo que el núcleo compilado), y no en el que aparecen los símbolos en las rhs.
+        follow = defaultdict(int, {nt: const[nt] for nt in self._prods})
 
         # El símbolo final $ pertenece a FOLLOW(start)
-        self._follow_cache[self.start].add('$')
-
-        # Repetimos hasta estabilidad (fixed-point)
-        changed = True
-        while changed:
-            changed = False
-            # Recorremos cada producción A -> alpha
-            for A, rhss in self.productions.items():
-                for rhs in rhss:
-                    symbols = rhs
-                    # Recorremos los símbolos de alpha para propagar información hacia la derecha
-                    for i, B in enumerate(symbols):
-                        # Solo nos interesan los no terminales B
-                        if not is_nonterminal(B):
-                            continue
-
-                        # Calculamos "resto" = símbolos a la derecha de B en la misma producción
-                        rest = tuple(symbols[i+1:])
-
-                        # FIRST(rest) nos indica qué terminales pueden aparecer justo después de B
-                        first_rest = self.first_of_rhs(rest)
-
-                        # Guardamos el estado anterior para detectar cambios
-                        before = set(self._follow_cache[B])
-
-                        # Añadimos FIRST(rest) sin ε a FOLLOW(B)
-                        self._follow_cache[B].update(x for x in first_rest if x != 'ε')
-
-                        # Si rest deriva ε (o rest está vacío), entonces todo FOLLOW(A) debe añadirse a FOLLOW(B)
-                        if 'ε' in first_rest or len(rest) == 0:
-                            self._follow_cache[B].update(self._follow_cache[A])
-
-                        # Si FOLLOW(B) cambió, marcamos changed=True para otra iteración
-                        if self._follow_cache[B] != before:
-                            changed = True
-
-        # Devolvemos el diccionario FOLLOW completo
-        return self._follow_cache
+        follow[self._start_id] |= _EOF_BIT
+
+        # Tarjan devuelve las componentes en orden topológico inverso; las recorremos al revés
+        # para que cada componente esté completa antes de propagarla a sus sucesores.
+        for component in reversed(_tarjan_scc(list(self._prods), edges)):
+            # Todos los miembros de la componente se incluyen mutuamente: unimos sus máscaras
+            merged = 0
+            for nt in component:
+                merged |= follow[nt]
+            for nt in component:
+                follow[nt] = merged
+
+            # Propagamos hacia las componentes sucesoras (follow[succ] |= follow[node]);
+            # dentro de la propia componente el OR no cambia nada.
+            for nt in component:
+                for succ in edges[nt]:
+                    follow[succ] |= merged
+
+        self._follow_cache.update(follow)
+
+    # FOLLOW: devuelve FOLLOW de todos los no terminales como conjuntos de símbolos.
+    def follow_all(self) -> Dict[str, Set[str]]:
+        return {self._id_sym[nt]: self._to_set(mask) for nt, mask in self._follow_cache.items()}
 
     # Prediction sets
     # Para cada producción A -> alpha, PRED(A -> alpha) = FIRST(alpha) - {ε} U (si ε ∈ FIRST(alpha) entonces FOLLOW(A))
-    def prediction_sets(self) -> Dict[str, Set[str]]:
+    # La clave es (A, i), con i la posición de la rhs en productions[A]; para mostrarla
+    # de forma legible se usa format_production(A, i).
+    def prediction_sets(self) -> Dict[Tuple[str, int], Set[str]]:
         preds = {}
-        # Aseguramos tener FOLLOW para todas las entradas (se calcula internamente)
-        follow_all = self.follow_all()
-
-        # Recorremos todas las producciones para formar las claves y sus conjuntos PRED
-        for A, rhss in self.productions.items():
-            for rhs in rhss:
-                # Definimos una clave legible para la producción
-                key = f"{A} -> {' '.join(rhs) if rhs else 'ε'}"
-                # Calculamos FIRST(rhs)
-                first_rhs = self.first_of_rhs(tuple(rhs))
-                # PRED inicia con FIRST(rhs) menos ε
-                pred = set(x for x in first_rhs if x != 'ε')
-                # Si FIRST(rhs) contiene ε, añadimos FOLLOW(A)
-                if 'ε' in first_rhs:
-                    pred.update(follow_all[A])
-                preds[key] = pred
+        # PRED ya está calculado; solo armamos las claves y convertimos las máscaras
+        for A in self.productions:
+            for i, pred in enumerate(self._pred_cache[self._sym_id[A]]):
+                preds[(A, i)] = self._to_set(pred)
         return preds
 
+    # Texto legible de la producción A -> productions[A][i] (por ejemplo 'A -> B C D').
+    def format_production(self, A: str, i: int) -> str:
+        return _format_production(A, self.productions[A][i])
+
+    # Resultados listos para mostrar o serializar: (FIRST, FOLLOW, PRED) con cada conjunto
+    # como tupla ya ordenada. Se arman una sola vez por gramática y cada máscara distinta se
+    # ordena una única vez (PRED suele repetir los mismos conjuntos que FIRST o FOLLOW).
+    def sorted_results(self) -> _SortedResults:
+        if self._sorted_results is None:
+            by_mask: Dict[int, Tuple[str, ...]] = {}
+
+            def as_sorted(mask: int) -> Tuple[str, ...]:
+                if mask not in by_mask:
+                    by_mask[mask] = tuple(sorted(self._to_set(mask)))
+                return by_mask[mask]
+
+            first = {A: as_sorted(self._first_cache[self._sym_id[A]]) for A in self.productions}
+            follow = {self._id_sym[nt]: as_sorted(mask) for nt, mask in self._follow_cache.items()}
+            preds = {
+                (A, i): as_sorted(mask)
+                for A in self.productions
+                for i, mask in enumerate(self._pred_cache[self._sym_id[A]])
+            }
+            # Vistas de solo lectura: la caché se comparte entre llamadas, así que quien la
+            # reciba no debe poder modificarla (para editarla, copiarla con dict(...)).
+            self._sorted_results = (MappingProxyType(first), MappingProxyType(follow), MappingProxyType(preds))
+        return self._sorted_results
+
 # Helpers
+# Texto legible de una producción A -> rhs; la rhs vacía se muestra como ε.
+def _format_production(A: str, rhs: Sequence[str]) -> str:
+    return f"{A} -> {' '.join(rhs) if rhs else _EPS}"
+
+# Lista de símbolos para mostrar: las tuplas de Grammar.sorted_results() ya vienen ordenadas;
+# cualquier otra colección (por ejemplo los Set[str] de follow_all o prediction_sets) se ordena aquí.
+def _as_sorted_list(symbols: Collection[str]) -> List[str]:
+    return list(symbols) if isinstance(symbols, tuple) else sorted(symbols)
+
 # Función auxiliar para imprimir resultados de forma legible en consola.
-def pretty_print_results(title: str, productions: Dict[str, List[List[str]]], FIRST: Dict[str, Set[str]], FOLLOW: Dict[str, Set[str]], PRED: Dict[str, Set[str]]):
+# Acepta los conjuntos ya ordenados de Grammar.sorted_results() (no los vuelve a ordenar) o
+# conjuntos sin ordenar como los de follow_all() y prediction_sets().
+# PRED viene indexado por (A, i); las claves se formatean aquí, solo al imprimir.
+def pretty_print_results(title: str, productions: Dict[str, List[List[str]]], FIRST: Mapping[str, Collection[str]], FOLLOW: Mapping[str, Collection[str]], PRED: Mapping[Tuple[str, int], Collection[str]]):
     print('='*60)
     print(title)
     print('-'*60)
     print('Producciones:')
     for A, rhss in productions.items():
         for rhs in rhss:
-            print(f'  {A} -> {" ".join(rhs) if rhs else "ε"}')
+            print(f'  {_format_production(A, rhs)}')
     print('\nFIRST:')
     for nt in sorted(FIRST.keys()):
-        print(f'  FIRST({nt}) = {sorted(list(FIRST[nt]))}')
+        print(f'  FIRST({nt}) = {_as_sorted_list(FIRST[nt])}')
     print('\nFOLLOW:')
     for nt in sorted(FOLLOW.keys()):
-        print(f'  FOLLOW({nt}) = {sorted(list(FOLLOW[nt]))}')
+        print(f'  FOLLOW({nt}) = {_as_sorted_list(FOLLOW[nt])}')
     print('\nPREDICTION sets:')
-    for prod in sorted(PRED.keys()):
-        print(f'  {prod} -> {sorted(list(PRED[prod]))}')
+    labels = {(A, i): _format_production(A, productions[A][i]) for A, i in PRED}
+    for prod in sorted(PRED.keys(), key=labels.__getitem__):
+        print(f'  {labels[prod]} -> {_as_sorted_list(PRED[prod])}')
     print('='*60 + '\n')
 
 # Ejemplo de uso
@@ -215,12 +577,10 @@ if __name__ == '__main__':
 
     # Creamos la instancia Grammar para la primera gramática, indicando 'S' como símbolo inicial
     G1 = Grammar(productions1, start='S')
-    # Calculamos FIRST para cada no terminal (esto usa la implementación recursiva)
-    FIRST1 = {nt: G1.first(nt) for nt in productions1.keys()}
-    # Calculamos FOLLOW para todos los no terminales
-    FOLLOW1 = G1.follow_all()
-    # Calculamos los conjuntos de PREDICCIÓN para cada producción
-    PRED1 = G1.prediction_sets()
+    # Obtenemos FIRST de cada no terminal, FOLLOW de todos los no terminales y los conjuntos
+    # de PREDICCIÓN de cada producción (ya calculados al construir la gramática), como tuplas
+    # ordenadas listas para imprimir
+    FIRST1, FOLLOW1, PRED1 = G1.sorted_results()
 
     # Mostramos resultados en consola con formato legible
     pretty_print_results('Ejercicio 1', productions1, FIRST1, FOLLOW1, PRED1)
@@ -235,9 +595,7 @@ if __name__ == '__main__':
     }
 
     G2 = Grammar(productions2, start='S')
-    FIRST2 = {nt: G2.first(nt) for nt in productions2.keys()}
-    FOLLOW2 = G2.follow_all()
-    PRED2 = G2.prediction_sets()
+    FIRST2, FOLLOW2, PRED2 = G2.sorted_results()
 
     pretty_print_results('Ejercicio 2', productions2, FIRST2, FOLLOW2, PRED2)
 
@@ -245,8 +603,8 @@ if __name__ == '__main__':
     try:
         import json
         out = {
-            'exercise1': {'productions': productions1, 'FIRST': {k: sorted(list(v)) for k,v in FIRST1.items()}, 'FOLLOW': {k: sorted(list(v)) for k,v in FOLLOW1.items()}, 'PRED': {k: sorted(list(v)) for k,v in PRED1.items()}},
-            'exercise2': {'productions': productions2, 'FIRST': {k: sorted(list(v)) for k,v in FIRST2.items()}, 'FOLLOW': {k: sorted(list(v)) for k,v in FOLLOW2.items()}, 'PRED': {k: sorted(list(v)) for k,v in PRED2.items()}}
+            'exercise1': {'productions': productions1, 'FIRST': {k: list(v) for k,v in FIRST1.items()}, 'FOLLOW': {k: list(v) for k,v in FOLLOW1.items()}, 'PRED': {G1.format_production(*k): list(v) for k,v in PRED1.items()}},
+            'exercise2': {'productions': productions2, 'FIRST': {k: list(v) for k,v in FIRST2.items()}, 'FOLLOW': {k: list(v) for k,v in FOLLOW2.items()}, 'PRED': {G2.format_production(*k): list(v) for k,v in PRED2.items()}}
         }
         Path('/mnt/data/first_follow_pred_results_commented.json').write_text(json.dumps(out, indent=2, ensure_ascii=False), encoding='utf-8')
         print('Resultados guardados en /mnt/data/first_follow_pred_results_commented.json')
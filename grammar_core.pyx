@@ -0,0 +1,278 @@
+# distutils: language = c++
+# cython: language_level=3, boundscheck=False, wraparound=False, cdivision=True
+# David Castellanos código
+
+# Núcleo compilado (opcional) del análisis FIRST / FOLLOW / PREDICCIÓN.
+# Hace exactamente lo mismo que Grammar._analyze en first_follow_pred_full_commented.py,
+# pero cada máscara es una fila de W palabras uint64_t (W = número de símbolos / 64)
+# guardada en vectores de C++, y todos los bucles corren sin pasar por el intérprete.
+# Se construye con:  python3 setup.py build_ext --inplace
+# Si no está compilado, el script usa automáticamente la versión en Python puro.
+# Tras cualquier cambio aquí o en Grammar._analyze, `python3 check_core.py` compara ambas versiones.
+
+from libc.stdint cimport uint64_t
+from libcpp.deque cimport deque
+from libcpp.vector cimport vector
+
+import sys
+
+# Versión de la interfaz de analyze(); el script la comprueba al importar y, si no coincide
+# (por ejemplo, un .so compilado con una versión anterior), usa Python puro.
+# Hay que incrementarla cada vez que cambien los argumentos o la forma del resultado.
+INTERFACE_VERSION = 2
+
+# Mismos bits reservados que en el script: ε es el bit 0 y $ el bit 1 (ambos en la palabra 0)
+cdef uint64_t EPS_BIT = 1
+cdef uint64_t EOF_BIT = 2
+
+cdef bint _LITTLE_ENDIAN = sys.byteorder == 'little'
+
+
+# dst |= src sobre una fila de W palabras; devuelve si dst cambió.
+cdef inline bint _or_into(uint64_t* dst, const uint64_t* src, Py_ssize_t W) noexcept nogil:
+    cdef bint changed = False
+    cdef uint64_t old
+    cdef Py_ssize_t k
+    for k in range(W):
+        old = dst[k]
+        dst[k] = old | src[k]
+        if dst[k] != old:
+            changed = True
+    return changed
+
+
+# Convierte una fila de W palabras en la máscara equivalente como int de Python.
+# En máquinas little-endian los bytes de la fila ya son la máscara en ese orden, así
+# que basta con int.from_bytes; si no, se arma palabra por palabra.
+cdef object _to_int(const uint64_t* row, Py_ssize_t W):
+    if _LITTLE_ENDIAN:
+        return int.from_bytes((<const char*>row)[:W * 8], 'little')
+    cdef object mask = 0
+    cdef Py_ssize_t k
+    for k in range(W - 1, -1, -1):
+        mask = (mask << 64) | row[k]
+    return mask
+
+
+# Análisis completo de una gramática ya internada.
+# n_syms: cantidad de símbolos internados; prods: id del no terminal -> lista de rhs como
+# tuplas de ids (el mismo Grammar._prods); start_id: id del símbolo inicial.
+# Devuelve (nullable, first, follow, preds) con las máscaras como ints de Python:
+# nullable es el conjunto de ids anulables, first y follow van de id a máscara, y
+# preds de id a una lista con una máscara por rhs, en el orden de prods[A].
+def analyze(Py_ssize_t n_syms, dict prods, Py_ssize_t start_id):
+    cdef Py_ssize_t W = (n_syms + 63) // 64
+    cdef list nts = list(prods)
+    cdef Py_ssize_t N = len(nts)
+    cdef Py_ssize_t P, p, j, k, a, b, d, r, sym, top, w
+    cdef bint changed
+    cdef tuple rhs
+
+    # Fila de cada no terminal (-1 para los terminales)
+    cdef vector[Py_ssize_t] row_of = vector[Py_ssize_t](n_syms, -1)
+    for r in range(N):
+        row_of[<Py_ssize_t>nts[r]] = r
+    if start_id < 0 or start_id >= n_syms or row_of[start_id] < 0:
+        raise KeyError(start_id)
+
+    # Producciones aplanadas: owner[p] es la fila de A y syms[start[p]:start[p]+length[p]] su rhs.
+    # Las producciones de un mismo no terminal quedan contiguas.
+    cdef vector[Py_ssize_t] owner, start, length, syms
+    for r in range(N):
+        for rhs in prods[nts[r]]:
+            owner.push_back(r)
+            start.push_back(syms.size())
+            length.push_back(len(rhs))
+            for sym in rhs:
+                syms.push_back(sym)
+    P = owner.size()
+
+    # 1. Anulables: algoritmo de Knuth con contadores y lista de trabajo
+    cdef vector[char] nullable = vector[char](N, 0)
+    cdef vector[Py_ssize_t] remaining = length
+    cdef vector[vector[Py_ssize_t]] users = vector[vector[Py_ssize_t]](N)
+    cdef vector[Py_ssize_t] work
+    for p in range(P):
+        for j in range(start[p], start[p] + length[p]):
+            b = row_of[syms[j]]
+            if b >= 0:
+                users[b].push_back(p)
+        if length[p] == 0 and not nullable[owner[p]]:
+            nullable[owner[p]] = 1
+            work.push_back(owner[p])
+    while not work.empty():
+        b = work.back()
+        work.pop_back()
+        for p in users[b]:
+            remaining[p] -= 1
+            if remaining[p] == 0 and not nullable[owner[p]]:
+                nullable[owner[p]] = 1
+                work.push_back(owner[p])
+
+    # 2. FIRST: parte constante en las filas de first, dependencias en deps/dependents
+    cdef vector[uint64_t] first = vector[uint64_t](N * W, 0)
+    cdef vector[vector[Py_ssize_t]] deps = vector[vector[Py_ssize_t]](N)
+    cdef vector[vector[Py_ssize_t]] dependents = vector[vector[Py_ssize_t]](N)
+    # seen[b] == a marca que b ya está en deps[a] (las producciones de a son contiguas)
+    cdef vector[Py_ssize_t] seen = vector[Py_ssize_t](N, -1)
+    for p in range(P):
+        a = owner[p]
+        for j in range(start[p], start[p] + length[p]):
+            sym = syms[j]
+            b = row_of[sym]
+            if b < 0:
+                first[a * W + sym // 64] |= (<uint64_t>1) << (sym % 64)
+                break
+            if b != a and seen[b] != a:
+                seen[b] = a
+                deps[a].push_back(b)
+                dependents[b].push_back(a)
+            if not nullable[b]:
+                break
+
+    cdef deque[Py_ssize_t] queue
+    cdef vector[char] queued = vector[char](N, 0)
+    for a in range(N):
+        if not deps[a].empty():
+            queue.push_back(a)
+            queued[a] = 1
+    while not queue.empty():
+        a = queue.front()
+        queue.pop_front()
+        queued[a] = 0
+        changed = False
+        for b in deps[a]:
+            if _or_into(&first[a * W], &first[b * W], W):
+                changed = True
+        if changed:
+            for d in dependents[a]:
+                if not queued[d]:
+                    queued[d] = 1
+                    queue.push_back(d)
+    for a in range(N):
+        if nullable[a]:
+            first[a * W] |= EPS_BIT
+
+    # 3. Recorrido de derecha a izquierda por cada rhs: FIRST de los sufijos, FIRST(rhs)
+    #    y restricciones de FOLLOW (constantes en follow, inclusiones en edges)
+    cdef vector[uint64_t] rest = vector[uint64_t](W, 0)
+    cdef vector[uint64_t] follow = vector[uint64_t](N * W, 0)
+    cdef vector[uint64_t] rhs_first = vector[uint64_t](P * W, 0)
+    cdef vector[vector[Py_ssize_t]] edges = vector[vector[Py_ssize_t]](N)
+    for p in range(P):
+        a = owner[p]
+        for k in range(W):
+            rest[k] = 0
+        rest[0] = EPS_BIT
+        for j in range(start[p] + length[p] - 1, start[p] - 1, -1):
+            sym = syms[j]
+            b = row_of[sym]
+            if b < 0:
+                for k in range(W):
+                    rest[k] = 0
+                rest[sym // 64] = (<uint64_t>1) << (sym % 64)
+                continue
+
+            # FIRST(rest) - {ε} ⊆ FOLLOW(b); si rest deriva ε, FOLLOW(a) ⊆ FOLLOW(b)
+            follow[b * W] |= rest[0] & ~EPS_BIT
+            for k in range(1, W):
+                follow[b * W + k] |= rest[k]
+            if rest[0] & EPS_BIT:
+                edges[a].push_back(b)
+
+            # FIRST(b rest): con b anulable se suma a rest (sin ε); si no, lo reemplaza
+            if nullable[b]:
+                rest[0] |= first[b * W] & ~EPS_BIT
+                for k in range(1, W):
+                    rest[k] |= first[b * W + k]
+            else:
+                for k in range(W):
+                    rest[k] = first[b * W + k]
+        for k in range(W):
+            rhs_first[p * W + k] = rest[k]
+
+    # 4. FOLLOW: Tarjan iterativo sobre edges y propagación en orden topológico
+    follow[row_of[start_id] * W] |= EOF_BIT
+
+    cdef vector[Py_ssize_t] index = vector[Py_ssize_t](N, -1)
+    cdef vector[Py_ssize_t] lowlink = vector[Py_ssize_t](N, 0)
+    cdef vector[char] on_stack = vector[char](N, 0)
+    cdef vector[Py_ssize_t] stack
+    # Pila de trabajo: vértice y posición del próximo sucesor a visitar
+    cdef vector[Py_ssize_t] frames_v, frames_i
+    # Componentes en orden topológico inverso: comp_nodes[comp_start[c]:comp_start[c+1]]
+    cdef vector[Py_ssize_t] comp_nodes, comp_start
+    cdef Py_ssize_t counter = 0, v, root
+    for root in range(N):
+        if index[root] >= 0:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.push_back(root)
+        on_stack[root] = 1
+        frames_v.push_back(root)
+        frames_i.push_back(0)
+        while not frames_v.empty():
+            top = frames_v.size() - 1
+            v = frames_v[top]
+            if frames_i[top] < <Py_ssize_t>edges[v].size():
+                w = edges[v][frames_i[top]]
+                frames_i[top] += 1
+                if index[w] < 0:
+                    index[w] = lowlink[w] = counter
+                    counter += 1
+                    stack.push_back(w)
+                    on_stack[w] = 1
+                    frames_v.push_back(w)
+                    frames_i.push_back(0)
+                elif on_stack[w] and index[w] < lowlink[v]:
+                    lowlink[v] = index[w]
+                continue
+
+            frames_v.pop_back()
+            frames_i.pop_back()
+            if not frames_v.empty():
+                b = frames_v.back()
+                if lowlink[v] < lowlink[b]:
+                    lowlink[b] = lowlink[v]
+            if lowlink[v] == index[v]:
+                comp_start.push_back(comp_nodes.size())
+                while True:
+                    w = stack.back()
+                    stack.pop_back()
+                    on_stack[w] = 0
+                    comp_nodes.push_back(w)
+                    if w == v:
+                        break
+    comp_start.push_back(comp_nodes.size())
+
+    cdef vector[uint64_t] merged = vector[uint64_t](W, 0)
+    cdef Py_ssize_t c
+    for c in range(<Py_ssize_t>comp_start.size() - 2, -1, -1):
+        for k in range(W):
+            merged[k] = 0
+        for j in range(comp_start[c], comp_start[c + 1]):
+            _or_into(&merged[0], &follow[comp_nodes[j] * W], W)
+        for j in range(comp_start[c], comp_start[c + 1]):
+            a = comp_nodes[j]
+            for k in range(W):
+                follow[a * W + k] = merged[k]
+            for b in edges[a]:
+                _or_into(&follow[b * W], &merged[0], W)
+
+    # 5. PRED y conversión de vuelta a objetos de Python
+    cdef vector[uint64_t] pred = vector[uint64_t](W, 0)
+    preds_out = {A: [] for A in nts}
+    for p in range(P):
+        a = owner[p]
+        for k in range(W):
+            pred[k] = rhs_first[p * W + k]
+        pred[0] &= ~EPS_BIT
+        if rhs_first[p * W] & EPS_BIT:
+            _or_into(&pred[0], &follow[a * W], W)
+        preds_out[nts[a]].append(_to_int(&pred[0], W))
+
+    nullable_out = {nts[r] for r in range(N) if nullable[r]}
+    first_out = {nts[r]: _to_int(&first[r * W], W) for r in range(N)}
+    follow_out = {nts[r]: _to_int(&follow[r * W], W) for r in range(N)}
+    return nullable_out, first_out, follow_out, preds_out
@@ -0,0 +1,11 @@
+# Construye el núcleo compilado opcional (grammar_core.pyx):
+#   python3 setup.py build_ext --inplace
+# Requiere Cython y un compilador de C++. Sin él, first_follow_pred_full_commented.py
+# funciona igual usando la implementación en Python puro.
+from setuptools import setup
+from Cython.Build import cythonize
+
+setup(
+    name='grammar_core',
+    ext_modules=cythonize('grammar_core.pyx'),
+)